@@ -14,7 +14,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-from __future__ import division
 import uuid
 import math
 from . import config
@@ -22,6 +21,18 @@ from . import etpatch as ET
 from . import byteconv as bc
 from . import shared
 
+# Local copies of configuration flags that are read in (inner loops of) the
+# validator functions. Use loadConfig to update them after changing config.
+_OUTPUT_VERBOSE_FLAG = config.OUTPUT_VERBOSE_FLAG
+_EXTRACT_NULL_TERMINATED_XML_FLAG = config.EXTRACT_NULL_TERMINATED_XML_FLAG
+
+
+def loadConfig():
+    """Copy the configuration flags used by the validator functions from config."""
+    global _OUTPUT_VERBOSE_FLAG, _EXTRACT_NULL_TERMINATED_XML_FLAG
+    _OUTPUT_VERBOSE_FLAG = config.OUTPUT_VERBOSE_FLAG
+    _EXTRACT_NULL_TERMINATED_XML_FLAG = config.EXTRACT_NULL_TERMINATED_XML_FLAG
+
 
 class BoxValidator:
     """Marker tags/codes that identify all sub-boxes as hexadecimal strings.
@@ -230,13 +241,9 @@ class BoxValidator:
 
     def testFor(self, testType, testResult):
         """Add testResult node to tests element tree."""
-        if config.OUTPUT_VERBOSE_FLAG is False:
-            # Non-verbose output: only add results of tests that failed
-            if testResult is False:
-                self.tests.appendChildTagWithText(testType, testResult)
-
-        else:
-            # Verbose output, add results of all tests
+        # Verbose output: add results of all tests; non-verbose output: only
+        # add results of tests that failed
+        if _OUTPUT_VERBOSE_FLAG or testResult is False:
             self.tests.appendChildTagWithText(testType, testResult)
 
     def addCharacteristic(self, characteristic, charValue):
@@ -2567,7 +2574,7 @@ class BoxValidator:
             containsWellformedXML = False
 
             # Useful for extracting null-terminated XML (older Kakadu versions)
-            if config.EXTRACT_NULL_TERMINATED_XML_FLAG:
+            if _EXTRACT_NULL_TERMINATED_XML_FLAG:
                 try:
                     data = bc.removeNullTerminator(data)
                     dataAsElement = ET.fromstring(data)
@@ -2618,7 +2625,7 @@ class BoxValidator:
 
                 # Useful for extracting null-terminated XML (older Kakadu
                 # versions)
-                if config.EXTRACT_NULL_TERMINATED_XML_FLAG:
+                if _EXTRACT_NULL_TERMINATED_XML_FLAG:
                     try:
                         data = bc.removeNullTerminator(data)
                         dataAsElement = ET.fromstring(data)
@@ -19,16 +19,22 @@ import binascii
 import unicodedata
 
 
-def _doConv(bytestr, bOrder, formatCharacter):
-    """Convert bytestr object of bOrder byteorder.
+# Precompiled struct formats (all big-endian), so that the format string
+# does not need to be built and looked up on every conversion
+_ULONG_LONG = struct.Struct(">Q")
+_UINT = struct.Struct(">I")
+_USHORT_INT = struct.Struct(">H")
+_UNSIGNED_CHAR = struct.Struct(">B")
+_SIGNED_CHAR = struct.Struct(">b")
 
-    Formatted using formatCharacter.
-    Returns -9999 if struct.unpack raises an error
+
+def _doConv(bytestr, structFormat):
+    """Convert bytestr object using precompiled struct.Struct object structFormat.
+
+    Returns -9999 if unpacking raises an error
     """
-    # Format string for unpack
-    formatStr = bOrder + formatCharacter
     try:
-        result = struct.unpack(formatStr, bytestr)[0]
+        result = structFormat.unpack(bytestr)[0]
     except:
         result = -9999
     return result
@@ -39,7 +45,7 @@ def bytesToULongLong(bytestring):
 
     Assuming big-endian byte order.
     """
-    return _doConv(bytestring, ">", "Q")
+    return _doConv(bytestring, _ULONG_LONG)
 
 
 def bytesToUInt(bytestring):
@@ -47,7 +53,7 @@ def bytesToUInt(bytestring):
 
     Assuming big-endian byte order.
     """
-    return _doConv(bytestring, ">", "I")
+    return _doConv(bytestring, _UINT)
 
 
 def bytesToUShortInt(bytestring):
@@ -55,7 +61,7 @@ def bytesToUShortInt(bytestring):
 
     Assuming big-endian byte order.
     """
-    return _doConv(bytestring, ">", "H")
+    return _doConv(bytestring, _USHORT_INT)
 
 
 def bytesToUnsignedChar(bytestring):
@@ -63,7 +69,7 @@ def bytesToUnsignedChar(bytestring):
 
     Assuming big-endian byte order.
     """
-    return _doConv(bytestring, ">", "B")
+    return _doConv(bytestring, _UNSIGNED_CHAR)
 
 
 def bytesToSignedChar(bytestring):
@@ -71,7 +77,7 @@ def bytesToSignedChar(bytestring):
 
     Assuming big-endian byte order.
     """
-    return _doConv(bytestring, ">", "b")
+    return _doConv(bytestring, _SIGNED_CHAR)
 
 def bytesToInteger(bytestring):
     """Unpack byte string of any length to integer.
@@ -114,14 +120,44 @@ def containsControlCharacters(bytestring):
     return False
 
 
+class _ControlCharacterTable(dict):
+    """Translation table for str.translate that deletes control characters.
+
+    Entries are computed on first use of each code point, so repeated
+    characters only go through unicodedata once. Only code points up to
+    maxCachedCodePoint (the Basic Multilingual Plane) are cached, so that the
+    table can't grow without bounds.
+    """
+
+    # Tab, newline and return are part of C0, but are allowed in XML
+    allowedChars = [u'\t', u'\n', u'\r']
+
+    maxCachedCodePoint = 0xFFFF
+
+    def __missing__(self, codePoint):
+        """Compute, cache and return the mapping for codePoint."""
+        ch = chr(codePoint)
+        if unicodedata.category(ch)[0] != "C" or ch in self.allowedChars:
+            value = codePoint
+        else:
+            value = None
+        if codePoint <= self.maxCachedCodePoint:
+            self[codePoint] = value
+        return value
+
+
+# Prefill the Latin-1 range, which covers the vast majority of property values
+_CONTROL_CHARACTER_TABLE = _ControlCharacterTable()
+for _codePoint in range(256):
+    _CONTROL_CHARACTER_TABLE[_codePoint]  # pylint: disable=W0104
+
+
 def removeControlCharacters(string):
     """Remove control characters from string.
 
     Adapted from: http://stackoverflow.com/a/19016117/1209004
     """
-    # Tab, newline and return are part of C0, but are allowed in XML
-    allowedChars = [u'\t', u'\n', u'\r']
-    return "".join(ch for ch in string if unicodedata.category(ch)[0] != "C" or ch in allowedChars)
+    return string.translate(_CONTROL_CHARACTER_TABLE)
 
 
 def removeNullTerminator(bytestring):
@@ -22,10 +22,9 @@ INPUT_RECURSIVE_FLAG = False
 INPUT_WRAPPER_FLAG = False
 NO_PRETTY_XML_FLAG = False
 LEGACY_XML_FLAG = False
+VALID_ONLY_FLAG = False
 MIX_FLAG = 0
+JOBS = 1
 ERR_CODE_NO_IMAGES = -7
 UTF8_ENCODING = "UTF-8"
 PLATFORM = sys.platform
-PYTHON_VERSION = sys.version
-PYTHON_2 = "2"
-PYTHON_3 = "3"
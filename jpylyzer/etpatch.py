@@ -21,7 +21,9 @@ TODO:
 
 import xml.etree.ElementTree as ET
 from . import byteconv as bc
-from . import config
+
+# Numeric data types (values of these types are converted with str)
+NUMERIC_TYPES = frozenset((int, float, bool))
 
 
 def tostring(elem, enc, meth):
@@ -110,19 +112,6 @@ class Element(ET.Element):
 
             # Step 2: convert all values to text strings.
 
-            # First set up list of all numeric data types,
-            # which is dependent on the Python version used
-
-            if config.PYTHON_VERSION.startswith(config.PYTHON_2):
-                # Python 2.x
-                # pylint: disable=E0602
-                numericTypes = [int, long, float, bool]
-                # Long type is deprecated in Python 3.x!
-            else:
-                numericTypes = [int, float, bool]
-
-            # Convert
-
             if remappedValue is not None:
                 # Data type
                 textType = type(remappedValue)
@@ -130,7 +119,7 @@ class Element(ET.Element):
                 # Convert text field, depending on type
                 if textType == bytes:
                     textOut = bc.bytesToText(remappedValue)
-                elif textType in numericTypes:
+                elif textType in NUMERIC_TYPES:
                     textOut = str(remappedValue)
                 else:
                     textOut = bc.removeControlCharacters(remappedValue)
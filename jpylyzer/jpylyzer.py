@@ -1,8 +1,7 @@
 #! /usr/bin/env python
 """Jpylyzer validator for JPEG 200 Part 1 (JP2) images.
 
-Requires: Python 2.7 (older versions won't work) OR Python 3.2 or more recent
-  (Python 3.0 and 3.1 won't work either!)
+Requires: Python 3.9 or more recent
 
 Copyright (C) 2011 - 2017 Johan van der Knijff, Koninklijke Bibliotheek -
   National Library of the Netherlands
@@ -37,12 +36,15 @@ import os
 import time
 import datetime
 import glob
+import fnmatch
 import argparse
-import codecs
+import collections
+import io
+import itertools
 import re
-from xml.dom import minidom
+from types import MappingProxyType
 import xml.etree.ElementTree as ETree
-from six import u
+from concurrent.futures import ProcessPoolExecutor
 from . import config
 from . import etpatch as ET
 from . import boxvalidator as bv
@@ -62,8 +64,23 @@ __version__ = "2.0.0"
 PARSER = argparse.ArgumentParser(
     description="JP2 image validator and properties extractor")
 
-# list of existing files to be analysed
-EXISTING_FILES = []
+# Files smaller than this size (in bytes) are read into memory instead of
+# being memory mapped
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+# Buffer size (bytes) for output written to stdout
+OUTPUT_BUFFER_SIZE = 128 * 1024
+
+# Output of up to this many files (or bytes) is written at once
+OUTPUT_BATCH_ELEMENTS = 64
+OUTPUT_BATCH_SIZE = 1024 * 1024
+
+# Number of files per worker process that are submitted for analysis ahead of
+# the result that is written next (--jobs)
+JOBS_FILES_AHEAD = 16
+
+# Maximum number of worker processes on Windows (limit of ProcessPoolExecutor)
+MAX_JOBS_WINDOWS = 61
 
 # Name space and schema strings
 NS_STRING_1 = 'http://openpreservation.org/ns/jpylyzer/'
@@ -74,196 +91,233 @@ http://jpylyzer.openpreservation.org/jpylyzer-v-1-1.xsd'
 LOC_SCHEMA_STRING_2 = 'http://openpreservation.org/ns/jpylyzer/v2/ \
 http://jpylyzer.openpreservation.org/jpylyzer-v-2-0.xsd'
 
+# Start (XML declaration) and end of output, as UTF-8 encoded bytes, without
+# and with <jpylyzer> wrapper element (or <results> for legacy output)
+XML_DECLARATION = "<?xml version='1.0' encoding='UTF-8'?>\n"
+XML_HEAD = XML_DECLARATION.encode(config.UTF8_ENCODING)
+XML_HEAD_WRAPPED = (XML_DECLARATION +
+                    "<jpylyzer xmlns=\"" + NS_STRING_2 + "\" " +
+                    "xmlns:xsi=\"" + XSI_NS_STRING + "\" " +
+                    "xsi:schemaLocation=\"" + LOC_SCHEMA_STRING_2 + "\">\n"
+                   ).encode(config.UTF8_ENCODING)
+XML_HEAD_WRAPPED_LEGACY = (XML_DECLARATION +
+                           "<results xmlns=\"" + NS_STRING_1 + "\" " +
+                           "xmlns:xsi=\"" + XSI_NS_STRING + "\" " +
+                           "xsi:schemaLocation=\"" + LOC_SCHEMA_STRING_1 + "\">\n"
+                          ).encode(config.UTF8_ENCODING)
+XML_TAIL_WRAPPED = b"</jpylyzer>\n"
+XML_TAIL_WRAPPED_LEGACY = b"</results>\n"
+
+# Translation table that replaces all surrogate code points with '?'
+_SURROGATE_TRANS = dict.fromkeys(range(0xD800, 0xE000), '?')
+
+# Mappings of 'raw' property values (mostly integer values) to corresponding
+# text descriptions. These never change at runtime, so they are built once at
+# import time and exposed as read-only mappings.
+
+# Generic 0 = no, 1=yes mapping (used for various properties)
+_YES_NO_MAP = MappingProxyType({
+    0: "no",
+    1: "yes"})
+
+# Bits per component: sign (Image HeaderBox, Bits Per Component Box, SIZ header
+# in codestream)
+_SIGN_MAP = MappingProxyType({
+    0: "unsigned",
+    1: "signed"})
+
+# Compression type (Image Header Box)
+_C_MAP = MappingProxyType({
+    7: "jpeg2000"})
+
+# meth (Colour Specification Box)
+_METH_MAP = MappingProxyType({
+    1: "Enumerated",
+    2: "Restricted ICC",
+    3: "Any ICC",  # JPX only
+    4: "Vendor Colour"})  # JPX only
+
+# enumCS (Colour Specification Box)
+_ENUM_CS_MAP = MappingProxyType({
+    16: "sRGB",
+    17: "greyscale",
+    18: "sYCC"})
+
+# Profile Class (ICC)
+_PROFILE_CLASS_MAP = MappingProxyType({
+    b'scnr': "Input Device Profile",
+    b'mntr': "Display Device Profile",
+    b'prtr': "Output Device Profile",
+    b'link': "DeviceLink Profile",
+    b'spac': "ColorSpace Conversion Profile",
+    b'abst': "Abstract Profile",
+    b'nmcl': "Named Colour Profile"})
+
+# Primary Platform (ICC)
+_PRIMARY_PLATFORM_MAP = MappingProxyType({
+    b'APPL': "Apple Computer, Inc.",
+    b'MSFT': "Microsoft Corporation",
+    b'SGI': "Silicon Graphics, Inc.",
+    b'SUNW': "Sun Microsystems, Inc."})
+
+# Transparency (ICC)
+_TRANSPARENCY_MAP = MappingProxyType({
+    0: "Reflective",
+    1: "Transparent"})
+
+# Glossiness (ICC)
+_GLOSSINESS_MAP = MappingProxyType({
+    0: "Glossy",
+    1: "Matte"})
+
+# Polarity (ICC)
+_POLARITY_MAP = MappingProxyType({
+    0: "Positive",
+    1: "Negative"})
+
+# Colour (ICC)
+_COLOUR_MAP = MappingProxyType({
+    0: "Colour",
+    1: "Black and white"})
+
+# Rendering intent (ICC)
+_RENDERING_INTENT_MAP = MappingProxyType({
+    0: "Perceptual",
+    1: "Media-Relative Colorimetric",
+    2: "Saturation",
+    3: "ICC-Absolute Colorimetric"})
+
+# mTyp (Component Mapping box)
+_M_TYP_MAP = MappingProxyType({
+    0: "direct use",
+    1: "palette mapping"})
+
+# Channel type (Channel Definition Box)
+_C_TYP_MAP = MappingProxyType({
+    0: "colour",
+    1: "opacity",
+    2: "premultiplied opacity",
+    65535: "not specified"})
+
+# Channel association (Channel Definition Box)
+_C_ASSOC_MAP = MappingProxyType({
+    0: "all colours",
+    65535: "no colours"})
+
+# Decoder capabilities, rsiz (Codestream, SIZ)
+_RSIZ_MAP = MappingProxyType({
+    0: "ISO/IEC 15444-1",  # Does this correspiond to Profile 2??
+    1: "Profile 0",
+    2: "Profile 1"})
+
+# Precincts (Codestream, COD)
+_PRECINCTS_MAP = MappingProxyType({
+    0: "default",
+    1: "user defined"})
+
+# Progression order (Codestream, COD)
+_ORDER_MAP = MappingProxyType({
+    0: "LRCP",
+    1: "RLCP",
+    2: "RPCL",
+    3: "PCRL",
+    4: "CPRL"})
+
+# Transformation type (Codestream, COD)
+_TRANSFORMATION_MAP = MappingProxyType({
+    0: "9-7 irreversible",
+    1: "5-3 reversible"})
+
+# roiStyle parameter (Codestream, RGN)
+_ROI_STYLE_MAP = MappingProxyType({
+    0: "Implicit ROI (maximum shift)"})
+
+# Quantization style (Codestream, QCD)
+_Q_STYLE_MAP = MappingProxyType({
+    0: "no quantization",
+    1: "scalar derived",
+    2: "scalar expounded"})
+
+# Registration value (Codestream, COM)
+_REGISTRATION_MAP = MappingProxyType({
+    0: "binary",
+    1: "ISO/IEC 8859-15 (Latin)"})
+
+# Master dictionary for mapping of text descriptions to enumerated values
+# Key: corresponds to parameter tag name
+# Value: sub-dictionary with mappings for all property values
+_ENUMERATIONS = {
+    'unkC': _YES_NO_MAP,
+    'iPR': _YES_NO_MAP,
+    'profileClass': _PROFILE_CLASS_MAP,
+    'primaryPlatform': _PRIMARY_PLATFORM_MAP,
+    'embeddedProfile': _YES_NO_MAP,
+    'profileCannotBeUsedIndependently': _YES_NO_MAP,
+    'transparency': _TRANSPARENCY_MAP,
+    'glossiness': _GLOSSINESS_MAP,
+    'polarity': _POLARITY_MAP,
+    'colour': _COLOUR_MAP,
+    'renderingIntent': _RENDERING_INTENT_MAP,
+    'bSign': _SIGN_MAP,
+    'mTyp': _M_TYP_MAP,
+    'precincts': _PRECINCTS_MAP,
+    'sop': _YES_NO_MAP,
+    'eph': _YES_NO_MAP,
+    'multipleComponentTransformation': _YES_NO_MAP,
+    'codingBypass': _YES_NO_MAP,
+    'resetOnBoundaries': _YES_NO_MAP,
+    'termOnEachPass': _YES_NO_MAP,
+    'vertCausalContext': _YES_NO_MAP,
+    'predTermination': _YES_NO_MAP,
+    'segmentationSymbols': _YES_NO_MAP,
+    'bPCSign': _SIGN_MAP,
+    'ssizSign': _SIGN_MAP,
+    'c': _C_MAP,
+    'meth': _METH_MAP,
+    'enumCS': _ENUM_CS_MAP,
+    'cTyp': _C_TYP_MAP,
+    'cAssoc': _C_ASSOC_MAP,
+    'order': _ORDER_MAP,
+    'roiStyle': _ROI_STYLE_MAP,
+    'transformation': _TRANSFORMATION_MAP,
+    'rsiz': _RSIZ_MAP,
+    'qStyle': _Q_STYLE_MAP,
+    'rcom': _REGISTRATION_MAP}
+
+_ENUMERATIONS_MAP = MappingProxyType(_ENUMERATIONS)
+
+# Jpylyzer 1.x output reports precincts as a yes/no value
+_ENUMERATIONS_MAP_LEGACY = MappingProxyType(dict(_ENUMERATIONS,
+                                                 precincts=_YES_NO_MAP))
+
+
 def generatePropertiesRemapTable():
-    """Generate nested dictionary.
+    """Return nested dictionary.
 
     Dictionary is used to map 'raw' property values (mostly integer values)
     to corresponding text descriptions.
     """
-    # Master dictionary for mapping of text descriptions to enumerated values
-    # Key: corresponds to parameter tag name
-    # Value: sub-dictionary with mappings for all property values
-    enumerationsMap = {}
-
-    # Sub-dictionaries for individual properties
-
-    # Generic 0 = no, 1=yes mapping (used for various properties)
-    yesNoMap = {}
-    yesNoMap[0] = "no"
-    yesNoMap[1] = "yes"
-
-    # Bits per component: sign (Image HeaderBox, Bits Per Component Box, SIZ header
-    # in codestream)
-    signMap = {}
-    signMap[0] = "unsigned"
-    signMap[1] = "signed"
-
-    # Compression type (Image Header Box)
-    cMap = {}
-    cMap[7] = "jpeg2000"
-
-    # meth (Colour Specification Box)
-    methMap = {}
-    methMap[1] = "Enumerated"
-    methMap[2] = "Restricted ICC"
-    methMap[3] = "Any ICC"  # JPX only
-    methMap[4] = "Vendor Colour"  # JPX only
-
-    # enumCS (Colour Specification Box)
-    enumCSMap = {}
-    enumCSMap[16] = "sRGB"
-    enumCSMap[17] = "greyscale"
-    enumCSMap[18] = "sYCC"
-
-    # Profile Class (ICC)
-    profileClassMap = {}
-    profileClassMap[b'scnr'] = "Input Device Profile"
-    profileClassMap[b'mntr'] = "Display Device Profile"
-    profileClassMap[b'prtr'] = "Output Device Profile"
-    profileClassMap[b'link'] = "DeviceLink Profile"
-    profileClassMap[b'spac'] = "ColorSpace Conversion Profile"
-    profileClassMap[b'abst'] = "Abstract Profile"
-    profileClassMap[b'nmcl'] = "Named Colour Profile"
-
-    # Primary Platform (ICC)
-    primaryPlatformMap = {}
-    primaryPlatformMap[b'APPL'] = "Apple Computer, Inc."
-    primaryPlatformMap[b'MSFT'] = "Microsoft Corporation"
-    primaryPlatformMap[b'SGI'] = "Silicon Graphics, Inc."
-    primaryPlatformMap[b'SUNW'] = "Sun Microsystems, Inc."
-
-    # Transparency (ICC)
-    transparencyMap = {}
-    transparencyMap[0] = "Reflective"
-    transparencyMap[1] = "Transparent"
-
-    # Glossiness (ICC)
-    glossinessMap = {}
-    glossinessMap[0] = "Glossy"
-    glossinessMap[1] = "Matte"
-
-    # Polarity (ICC)
-    polarityMap = {}
-    polarityMap[0] = "Positive"
-    polarityMap[1] = "Negative"
-
-    # Colour (ICC)
-    colourMap = {}
-    colourMap[0] = "Colour"
-    colourMap[1] = "Black and white"
-
-    # Rendering intent (ICC)
-    renderingIntentMap = {}
-    renderingIntentMap[0] = "Perceptual"
-    renderingIntentMap[1] = "Media-Relative Colorimetric"
-    renderingIntentMap[2] = "Saturation"
-    renderingIntentMap[3] = "ICC-Absolute Colorimetric"
-
-    # mTyp (Component Mapping box)
-    mTypMap = {}
-    mTypMap[0] = "direct use"
-    mTypMap[1] = "palette mapping"
-
-    # Channel type (Channel Definition Box)
-    cTypMap = {}
-    cTypMap[0] = "colour"
-    cTypMap[1] = "opacity"
-    cTypMap[2] = "premultiplied opacity"
-    cTypMap[65535] = "not specified"
-
-    # Channel association (Channel Definition Box)
-    cAssocMap = {}
-    cAssocMap[0] = "all colours"
-    cAssocMap[65535] = "no colours"
-
-    # Decoder capabilities, rsiz (Codestream, SIZ)
-    rsizMap = {}
-    rsizMap[0] = "ISO/IEC 15444-1"  # Does this correspiond to Profile 2??
-    rsizMap[1] = "Profile 0"
-    rsizMap[2] = "Profile 1"
-
-    # Precincts (Codestream, COD)
-    precinctsMap = {}
-    precinctsMap[0] = "default"
-    precinctsMap[1] = "user defined"
-
-    # Progression order (Codestream, COD)
-    orderMap = {}
-    orderMap[0] = "LRCP"
-    orderMap[1] = "RLCP"
-    orderMap[2] = "RPCL"
-    orderMap[3] = "PCRL"
-    orderMap[4] = "CPRL"
-
-    # Transformation type (Codestream, COD)
-    transformationMap = {}
-    transformationMap[0] = "9-7 irreversible"
-    transformationMap[1] = "5-3 reversible"
-
-    # roiStyle parameter (Codestream, RGN)
-    roiStyleMap = {}
-    roiStyleMap[0] = "Implicit ROI (maximum shift)"
-
-    # Quantization style (Codestream, QCD)
-    qStyleMap = {}
-    qStyleMap[0] = "no quantization"
-    qStyleMap[1] = "scalar derived"
-    qStyleMap[2] = "scalar expounded"
-
-    # Registration value (Codestream, COM)
-    registrationMap = {}
-    registrationMap[0] = "binary"
-    registrationMap[1] = "ISO/IEC 8859-15 (Latin)"
-
-    # Add sub-dictionaries to master dictionary, using tag name as key
-    enumerationsMap['unkC'] = yesNoMap
-    enumerationsMap['iPR'] = yesNoMap
-    enumerationsMap['profileClass'] = profileClassMap
-    enumerationsMap['primaryPlatform'] = primaryPlatformMap
-    enumerationsMap['embeddedProfile'] = yesNoMap
-    enumerationsMap['profileCannotBeUsedIndependently'] = yesNoMap
-    enumerationsMap['transparency'] = transparencyMap
-    enumerationsMap['glossiness'] = glossinessMap
-    enumerationsMap['polarity'] = polarityMap
-    enumerationsMap['colour'] = colourMap
-    enumerationsMap['renderingIntent'] = renderingIntentMap
-    enumerationsMap['bSign'] = signMap
-    enumerationsMap['mTyp'] = mTypMap
-    if not config.LEGACY_XML_FLAG:
-        enumerationsMap['precincts'] = precinctsMap
-    else:
-        enumerationsMap['precincts'] = yesNoMap
-    enumerationsMap['sop'] = yesNoMap
-    enumerationsMap['eph'] = yesNoMap
-    enumerationsMap['multipleComponentTransformation'] = yesNoMap
-    enumerationsMap['codingBypass'] = yesNoMap
-    enumerationsMap['resetOnBoundaries'] = yesNoMap
-    enumerationsMap['termOnEachPass'] = yesNoMap
-    enumerationsMap['vertCausalContext'] = yesNoMap
-    enumerationsMap['predTermination'] = yesNoMap
-    enumerationsMap['segmentationSymbols'] = yesNoMap
-    enumerationsMap['bPCSign'] = signMap
-    enumerationsMap['ssizSign'] = signMap
-    enumerationsMap['c'] = cMap
-    enumerationsMap['meth'] = methMap
-    enumerationsMap['enumCS'] = enumCSMap
-    enumerationsMap['cTyp'] = cTypMap
-    enumerationsMap['cAssoc'] = cAssocMap
-    enumerationsMap['order'] = orderMap
-    enumerationsMap['roiStyle'] = roiStyleMap
-    enumerationsMap['transformation'] = transformationMap
-    enumerationsMap['rsiz'] = rsizMap
-    enumerationsMap['qStyle'] = qStyleMap
-    enumerationsMap['rcom'] = registrationMap
-
-    return enumerationsMap
+    if config.LEGACY_XML_FLAG:
+        return _ENUMERATIONS_MAP_LEGACY
+    return _ENUMERATIONS_MAP
 
 
 def fileToMemoryMap(filename):
-    """Read contents of filename to memory map object."""
+    """Read contents of filename to memory map object.
+
+    Files smaller than MMAP_THRESHOLD are read into a bytes object instead,
+    which is cheaper than setting up a memory map for them.
+    """
     # Open filename
     f = open(filename, "rb")
 
+    # For small files a single sequential read beats mmap setup and
+    # demand paging
+    if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+        fileData = f.read()
+        f.close()
+        return fileData
+
     # Call to mmap is different on Linux and Windows, so we need to know
     # the current platform
     platform = config.PLATFORM
@@ -279,6 +333,16 @@ def fileToMemoryMap(filename):
     except ValueError:
         # mmap fails on empty files.
         fileData = ""
+    else:
+        # Box validator reads the data front to back, so tell the kernel
+        # (madvise is not available on Windows). This is only a hint, so
+        # errors are ignored
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            try:
+                fileData.madvise(mmap.MADV_SEQUENTIAL)
+                fileData.madvise(mmap.MADV_WILLNEED)
+            except (OSError, ValueError):
+                pass
 
     f.close()
     return fileData
@@ -333,10 +397,12 @@ def checkOneFile(path, validationFormat='jp2'):
         toolInfo.appendChildTagWithText("toolVersion", __version__)
     fileInfo.appendChildTagWithText("fileName", fileNameCleaned)
     fileInfo.appendChildTagWithText("filePath", filePathCleaned)
+    # Size and modification time from one single stat call
+    fileStat = os.stat(path)
     fileInfo.appendChildTagWithText(
-        "fileSizeInBytes", str(os.path.getsize(path)))
+        "fileSizeInBytes", str(fileStat.st_size))
     try:
-        dt = os.path.getmtime(path)
+        dt = fileStat.st_mtime
         lastModifiedDate = datetime.datetime.fromtimestamp(dt).isoformat()
     except ValueError:
         # Dates earlier than 1 Jan 1970 can raise ValueError on Windows
@@ -353,25 +419,35 @@ def checkOneFile(path, validationFormat='jp2'):
         # Contents of file to memory map object
         fileData = fileToMemoryMap(path)
 
-        # Validate according to value of validation format
+        # Validate according to value of validation format (with the current
+        # configuration settings)
+        bv.loadConfig()
         if validationFormat == 'jp2':
             resultsJP2 = bv.BoxValidator("JP2", fileData).validate()
         elif validationFormat == 'j2c':
             resultsJP2 = bv.BoxValidator("contiguousCodestreamBox", fileData).validate()
 
         fileIsValid = resultsJP2.isValid
-        tests = resultsJP2.tests
-        characteristics = resultsJP2.characteristics
 
-        if fileData != "":
+        # Only memory maps need closing (small files are read as bytes)
+        if hasattr(fileData, "close"):
             fileData.close()
 
-        # Generate property values remap table
-        remapTable = generatePropertiesRemapTable()
+        if config.VALID_ONLY_FLAG:
+            # Only validity is reported, so skip conversion of tests and
+            # characteristics tree altogether
+            tests = ET.Element("tests")
+            characteristics = ET.Element('properties')
+        else:
+            tests = resultsJP2.tests
+            characteristics = resultsJP2.characteristics
+
+            # Property values remap table
+            remapTable = generatePropertiesRemapTable()
 
-        # Create printable version of tests and characteristics tree
-        tests.makeHumanReadable()
-        characteristics.makeHumanReadable(remapTable)
+            # Create printable version of tests and characteristics tree
+            tests.makeHumanReadable()
+            characteristics.makeHumanReadable(remapTable)
     except Exception as ex:
         fileIsValid = False
         success = False
@@ -395,8 +471,9 @@ def checkOneFile(path, validationFormat='jp2'):
         tests = ET.Element("tests")
         characteristics = ET.Element('properties')
 
+    mixProperties = None
     if config.MIX_FLAG != 0 and fileIsValid:
-        mixProperties = mix.Mix(config.MIX_FLAG).generateMix(characteristics)
+        mixProperties = mix.getMix(config.MIX_FLAG).generateMix(characteristics)
 
     # Add status info
     statusInfo.appendChildTagWithText("success", str(success))
@@ -424,11 +501,45 @@ def checkOneFile(path, validationFormat='jp2'):
     extension = ET.Element('propertiesExtension')
     if config.MIX_FLAG != 0:
         root.append(extension)
-        if validationFormat == "jp2" and fileIsValid:
+        if validationFormat == "jp2" and mixProperties is not None:
             extension.append(mixProperties)
 
     return root
 
+def checkOneFileInWorker(path, settings):
+    """Process one file in a worker process and return analysis result as UTF-8 encoded XML.
+
+    The settings dictionary holds the values of all configuration settings of
+    the parent process, which are not inherited by spawned worker processes.
+    The result is serialized here, because passing bytes back to the main
+    process is much cheaper than pickling the element tree.
+    """
+    for name, value in settings.items():
+        setattr(config, name, value)
+    sink = io.BytesIO()
+    xmlElement = checkOneFile(path, config.VALIDATION_FORMAT)
+    getSerializer()(xmlElement, sink)
+    return sink.getvalue()
+
+
+def checkFilesInWorkers(executor, paths, settings):
+    """Analyse files in worker processes and yield results in input order.
+
+    Results are UTF-8 encoded XML from checkOneFileInWorker. Unlike
+    executor.map, which takes all paths before it returns, this only takes
+    paths up to a fixed number of files ahead of the next result. So files
+    are still found while earlier files are analysed.
+    """
+    futures = collections.deque()
+    filesAhead = JOBS_FILES_AHEAD * config.JOBS
+    for path in paths:
+        futures.append(executor.submit(checkOneFileInWorker, path, settings))
+        if len(futures) >= filesAhead:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
 def checkNullArgs(args):
     """Check if the passed args list.
 
@@ -459,265 +570,283 @@ def printHelpAndExit():
 
 def stripSurrogatePairs(ustring):
     """Remove surrogate pairs from a Unicode string."""
-    # This works for Python 3.x, but not for 2.x!
-    # Source: http://stackoverflow.com/q/19649463/1209004
-
-    if config.PYTHON_VERSION.startswith(config.PYTHON_3):
-        try:
-            ustring.encode('utf-8')
-        except UnicodeEncodeError:
-            # Strip away surrogate pairs
-            tmp = ustring.encode('utf-8', 'replace')
-            ustring = tmp.decode('utf-8', 'ignore')
-
-    # In Python 2.x we need to use regex
-    # Source: http://stackoverflow.com/a/18674109/1209004
-
-    if config.PYTHON_VERSION.startswith(config.PYTHON_2):
-        # Generate regex for surrogate pair detection
-
-        lone = re.compile(
-            u(r"""(?x)            # verbose expression (allows comments)
-            (                    # begin group
-            [\ud800-\udbff]      #   match leading surrogate
-            (?![\udc00-\udfff])  #   but only if not followed by trailing surrogate
-            )                    # end group
-            |                    #  OR
-            (                    # begin group
-            (?<![\ud800-\udbff]) #   if not preceded by leading surrogate
-            [\udc00-\udfff]      #   match trailing surrogate
-            )                   # end group
-            """))
-
-        # Remove surrogates (i.e. replace by empty string)
-        tmp = lone.sub(r'', ustring).encode('utf-8')
-        ustring = tmp.decode('utf-8')
-
-    return ustring
+    # Pure ASCII strings (the common case) cannot contain surrogates
+    if ustring.isascii():
+        return ustring
+
+    # Replace surrogate code points with '?' in a single pass
+    return ustring.translate(_SURROGATE_TRANS)
 
 
 def getFiles(searchpattern):
-    """Append paths of all files that match search pattern to EXISTING_FILES."""
-    results = glob.glob(searchpattern)
-    for f in results:
-        if os.path.isfile(f):
-            EXISTING_FILES.append(f)
+    """Return list with paths of all files that match search pattern."""
+    return [f for f in glob.glob(searchpattern) if os.path.isfile(f)]
+
+
+def _scanDirectory(dirPath):
+    """Return lists of DirEntry objects for files and subdirectories in dirPath.
+
+    As with os.walk, unreadable directories are skipped silently, and
+    symbolic links to directories are listed as subdirectories.
+    """
+    files = []
+    subDirs = []
+    try:
+        for entry in os.scandir(dirPath):
+            # File type comes from the directory listing, so only symbolic
+            # links need an extra stat call here
+            if entry.is_dir():
+                subDirs.append(entry)
+            else:
+                files.append(entry)
+    except OSError:
+        pass
+    return files, subDirs
+
+
+def _walkFiles(dirPath):
+    """Walk directory tree and yield DirEntry objects of all files.
+
+    Directories are visited depth-first, in the same order as os.walk, using
+    a stack instead of recursion. Symbolic links to directories are not
+    followed.
+    """
+    stack = [dirPath]
+    while stack:
+        files, subDirs = _scanDirectory(stack.pop())
+        yield from files
+        stack.extend(entry.path for entry in reversed(subDirs)
+                     if not entry.is_symlink())
 
 
 def getFilesWithPatternFromTree(rootDir, pattern):
-    """Recurse into directory tree and return list of all files.
+    """Walk directory tree and yield paths of all files that match pattern.
 
-    NOTE: directory names are disabled here!!
+    As with glob, hidden files only match if pattern starts with a dot.
+    Directories are visited in the same order as os.walk, and for each
+    directory the files in all of its subdirectories are yielded (including
+    subdirectories that are symbolic links, which are not walked further).
+    NOTE: files in rootDir itself are not included!!
     """
-    for dirname, dirnames, _ in os.walk(rootDir):
-        # Suppress directory names
-        for subdirname in dirnames:
-            thisDirectory = os.path.join(dirname, subdirname)
-            # find files matching the pattern in current path
-            searchpattern = os.path.join(thisDirectory, pattern)
-            getFiles(searchpattern)
+    # Translate pattern to a regular expression only once for all files
+    matchName = re.compile(fnmatch.translate(os.path.normcase(pattern))).match
+    matchHidden = pattern.startswith('.')
+    _, subDirs = _scanDirectory(rootDir)
+    # Stack of subdirectory lists of directories that are still to be visited
+    stack = [subDirs]
+    while stack:
+        subDirsOfSubDirs = []
+        for subDir in stack.pop():
+            files, subDirs = _scanDirectory(subDir.path)
+            for entry in files:
+                if (matchHidden or not entry.name.startswith('.')) and \
+                        matchName(os.path.normcase(entry.name)) and entry.is_file():
+                    yield entry.path
+            if not subDir.is_symlink():
+                subDirsOfSubDirs.append(subDirs)
+        stack.extend(reversed(subDirsOfSubDirs))
 
 
 def getFilesFromTree(rootDir):
-    """Recurse into directory tree and return list of all files.
+    """Recurse into directory tree and yield paths of all files.
 
     NOTE: directory names are disabled here!!
     """
-    for dirname, dirnames, filenames in os.walk(rootDir):
-        # Suppress directory names
-        for subdirname in dirnames:
-            # pylint: disable=W0612
-            thisDirectory = os.path.join(dirname, subdirname)
-
-        for filename in filenames:
-            thisFile = os.path.join(dirname, filename)
-            EXISTING_FILES.append(thisFile)
+    for entry in _walkFiles(rootDir):
+        yield entry.path
 
 
 def findFiles(recurse, paths):
-    """Find all files that match a wildcard expression and add their paths to EXISTING_FILES."""
-    WILDCARD = "*"
+    """Return list with paths of all files that match the input paths / wildcard expressions."""
+    return list(iterFiles(recurse, paths))
 
-    # process the list of input paths
-    for root in paths:
 
-        if config.PYTHON_VERSION.startswith(config.PYTHON_2):
-            # Convert root to UTF-8 (only needed for Python 2.x)
-            # pylint: disable=E0602
-            root = unicode(root, 'utf-8')
+def _iterWildcardFiles(root, recurse):
+    """Yield paths of all files that match wildcard expression root."""
+    # get the absolute path if not given
+    if not os.path.isabs(root):
+        root = os.path.abspath(root)
 
-        # WILDCARD IN PATH OR FILENAME
-        # In Linux wilcard expansion done by bash so, add file to list
-        if os.path.isfile(root):
-            EXISTING_FILES.append(root)
-        # Windows (& Linux with backslash prefix) does not expand wildcard '*'
-        # Find files in the input path and add to list
-        elif WILDCARD in root:
-            # get the absolute path if not given
-            if not os.path.isabs(root):
-                root = os.path.abspath(root)
+    # Expand wildcard in the input path. Returns a list of files, folders
+    filesList = glob.glob(root)
 
-            # Expand wildcard in the input path. Returns a list of files,
-            # folders
-            filesList = glob.glob(root)
+    if recurse and len(filesList) == 1 and os.path.isdir(filesList[0]):
+        # Expression matches one single directory: get files in this
+        # directory and all its sub dirs
+        yield from getFilesFromTree(filesList[0])
+        return
 
-            # If the input path is a directory, then glob expands it to full
-            # name
-            if len(filesList) == 1 and os.path.isdir(filesList[0]):
-                # set root to the expanded directory path
-                root = filesList[0]
+    # Files that match the expression
+    yield from (f for f in filesList if os.path.isfile(f))
 
-            # get files from directory
+    if recurse:
+        # Files in all subdirectories (at any depth) of the directories that
+        # match path, and whose names match filePattern
+        path, filePattern = os.path.split(root)
+        for dirPath in glob.iglob(path):
+            yield from getFilesWithPatternFromTree(dirPath, filePattern)
 
-            # If the input path returned files list, add files to List
 
-            if len(filesList) == 1 and os.path.isfile(filesList[0]):
-                EXISTING_FILES.append(filesList[0])
+def iterFiles(recurse, paths):
+    """Yield paths of all files that match the input paths / wildcard expressions.
 
-            if len(filesList) > 1:
-                for f in filesList:
-                    if os.path.isfile(f):
-                        EXISTING_FILES.append(f)
-
-        elif not os.path.isdir(root) and not os.path.isfile(root):
+    Files are found while they are used, so that processing of the first
+    files can start before all input paths are searched.
+    """
+    # process the list of input paths
+    for root in paths:
+        # In Linux wilcard expansion done by bash so, add file to list
+        if os.path.isfile(root):
+            yield root
+        elif os.path.isdir(root):
+            # get files in the current folder and sub dirs
+            if recurse:
+                yield from getFilesFromTree(os.path.abspath(root))
+        # Windows (& Linux with backslash prefix) does not expand wildcards
+        # ('*', '?' or '[...]')
+        elif glob.has_magic(root):
+            yield from _iterWildcardFiles(root, recurse)
+        else:
             # One or more (but not all) paths do no exist - print a warning
             msg = root + " does not exist"
             shared.printWarning(msg)
 
-        # RECURSION and WILDCARD IN RECURSION
-        # Check if recurse in the input path
-        if recurse:
-            # get absolute input path if not given
-            if not os.path.isabs(root):
-                root = os.path.abspath(root)
-
-            if WILDCARD in root:
-                pathAndFilePattern = os.path.split(root)
-                path = pathAndFilePattern[0]
-                filePattern = pathAndFilePattern[1]
-                filenameAndExtension = os.path.splitext(filePattern)
-                # input path contains wildcard
-                if WILDCARD in path:
-                    filepath = glob.glob(path)
-                    # if filepath is a folder, get files in current directory
-                    if len(filepath) == 1:
-                        getFilesWithPatternFromTree(filepath[0], filePattern)
-                    # if filepath is a list of files/folder
-                    # get all files in the tree matching the file pattern
-                    if len(filepath) > 1:
-                        for f in filepath:
-                            if os.path.isdir(f):
-                                getFilesWithPatternFromTree(f, filePattern)
-                # file name or extension contains wildcard
-                elif WILDCARD in filePattern:
-                    getFilesWithPatternFromTree(path, filePattern)
-                elif WILDCARD in filenameAndExtension:
-                    filenameAndExtension = os.path.splitext(filePattern)
-                    extension = WILDCARD + filenameAndExtension[1]
-                    getFilesWithPatternFromTree(path, extension)
-            # get files in the current folder and sub dirs w/o wildcard in path
-            elif os.path.isdir(root):
-                getFilesFromTree(root)
-
-
-def writeElement(elt, codec):
-    """Write element as XML to stdout using defined codec."""
-    # Element to string
-    if config.PYTHON_VERSION.startswith(config.PYTHON_2):
-        xmlOut = ET.tostring(elt, 'UTF-8', 'xml')
-    if config.PYTHON_VERSION.startswith(config.PYTHON_3):
-        xmlOut = ET.tostring(elt, 'unicode', 'xml')
-
-    if not config.NO_PRETTY_XML_FLAG:
-        # Make xml pretty
-        xmlPretty = minidom.parseString(xmlOut).toprettyxml('    ')
-
-        # Steps to get rid of xml declaration:
-        # String to list
-        xmlAsList = xmlPretty.split("\n")
-        # Remove first item (xml declaration)
-        del xmlAsList[0]
-        # Convert back to string
-        xmlOut = "\n".join(xmlAsList)
-
-        # Write output
-        codec.write(xmlOut)
-    else:
-        # Python2.x does automatic conversion between byte and string types,
-        # hence, binary data can be output using sys.stdout
-        if config.PYTHON_VERSION.startswith(config.PYTHON_2):
-            ETree.ElementTree(elt).write(codec, xml_declaration=False)
-        # Python3.x recognizes bytes and str as different types and encoded
-        # Unicode is represented as binary data. The underlying sys.stdout.buffer
-        # is used to write binary data
-        if config.PYTHON_VERSION.startswith(config.PYTHON_3):
-            codec.write(xmlOut)
+
+def openOutput():
+    """Return buffered binary stream that writes to stdout."""
+    # Anything already written to sys.stdout must come first
+    sys.stdout.flush()
+    return io.BufferedWriter(sys.stdout.buffer, OUTPUT_BUFFER_SIZE)
+
+
+def closeOutput(out):
+    """Flush stream from openOutput and detach it from stdout."""
+    # Detaching (instead of closing) leaves sys.stdout usable
+    out.detach()
+
+
+def _serializeRaw(elt, sink):
+    """Write element as UTF-8 encoded XML without formatting to binary sink."""
+    ETree.ElementTree(elt).write(sink, config.UTF8_ENCODING,
+                                 xml_declaration=False)
+
+
+def _serializePretty(elt, sink):
+    """Write element as pretty-printed UTF-8 encoded XML to binary sink (indents elt in place)."""
+    ETree.indent(elt, '    ')
+    _serializeRaw(elt, sink)
+    sink.write(b'\n')
+
+
+def getSerializer():
+    """Return function that serializes an element for the current settings.
+
+    The function writes the element as UTF-8 encoded bytes, without xml
+    declaration, to a binary stream.
+    """
+    if config.NO_PRETTY_XML_FLAG:
+        return _serializeRaw
+    return _serializePretty
+
+
+def writeElement(elt, out):
+    """Write element as UTF-8 encoded XML to binary output stream."""
+    writeElements([elt], out)
+
+
+def writeElements(elts, out):
+    """Write elements as UTF-8 encoded XML to binary output stream."""
+    _writeBatched(elts, getSerializer(), out)
+
+
+def writeSerialized(xmlOuts, out):
+    """Write serialized elements (UTF-8 encoded XML) to binary output stream."""
+    _writeBatched(xmlOuts, lambda xmlOut, sink: sink.write(xmlOut), out)
+
+
+def _writeBatched(items, writeItem, out):
+    """Write items to binary output stream in batches.
+
+    writeItem(item, sink) writes each item to one in-memory buffer, which is
+    reused for all items and written in batches. This saves a buffer and a
+    write call for each item.
+    """
+    sink = io.BytesIO()
+    batchLength = 0
+    try:
+        for item in items:
+            writeItem(item, sink)
+            batchLength += 1
+            if batchLength >= OUTPUT_BATCH_ELEMENTS or sink.tell() >= OUTPUT_BATCH_SIZE:
+                with sink.getbuffer() as batch:
+                    out.write(batch)
+                sink.seek(0)
+                sink.truncate()
+                batchLength = 0
+    finally:
+        # Also write results of files analysed before any error
+        with sink.getbuffer() as batch:
+            out.write(batch)
+
 
 def checkFiles(recurse, wrap, paths):
     """Check the input argument path(s) for existing files and analyse them."""
-    # Schema location (legacy, current)
-    if config.LEGACY_XML_FLAG:
-        locSchemaString = LOC_SCHEMA_STRING_1
-    else:
-        locSchemaString = LOC_SCHEMA_STRING_2
-
-    # Find existing files in the given input path(s)
-    findFiles(recurse, paths)
+    # Find existing files in the given input path(s). Remaining files are
+    # found while the first ones are analysed, so only look up the first one
+    # here
+    files = iterFiles(recurse, paths)
+    firstFile = next(files, None)
 
     # If there are no valid input files then exit program
-    checkNoInput(EXISTING_FILES)
-
-    # Set encoding of the terminal to UTF-8
-    if config.PYTHON_VERSION.startswith(config.PYTHON_2):
-        out = codecs.getwriter(config.UTF8_ENCODING)(sys.stdout)
-    elif config.PYTHON_VERSION.startswith(config.PYTHON_3):
-        out = codecs.getwriter(config.UTF8_ENCODING)(sys.stdout.buffer)
+    if firstFile is None:
+        checkNoInput([])
+    existingFiles = itertools.chain([firstFile], files)
 
     # Wrap the xml output in <jpylyzer> element, if wrapper flag is true
     # Note: this is the default behaviour in jpylyzer 2.x. Wrap
     # option now ONLY takes effect for legacy (1.x) output!
-
-    if config.LEGACY_XML_FLAG:
-        nsString = NS_STRING_1
-    else:
-        nsString = NS_STRING_2
-
-    if wrap or recurse:
-        xmlHead = "<?xml version='1.0' encoding='UTF-8'?>\n"
-        if not config.LEGACY_XML_FLAG:
-            xmlHead += "<jpylyzer xmlns=\"" + nsString + "\" "
-        else:
-            xmlHead += "<results xmlns=\"" + nsString + "\" "
-        xmlHead += "xmlns:xsi=\"" + XSI_NS_STRING + "\" "
-        xmlHead += "xsi:schemaLocation=\"" + locSchemaString + "\">\n"
+    if not (wrap or recurse):
+        xmlHead = XML_HEAD
+        xmlTail = b""
+    elif config.LEGACY_XML_FLAG:
+        xmlHead = XML_HEAD_WRAPPED_LEGACY
+        xmlTail = XML_TAIL_WRAPPED_LEGACY
     else:
-        xmlHead = "<?xml version='1.0' encoding='UTF-8'?>\n"
-    out.write(xmlHead)
+        xmlHead = XML_HEAD_WRAPPED
+        xmlTail = XML_TAIL_WRAPPED
 
-    # Create toolInfo element
+    # Binary stream on stdout, with a large buffer so that output is
+    # written with few system calls. All output is written as UTF-8 encoded
+    # bytes, so no text encoding layer is needed.
+    out = openOutput()
 
-    if not config.LEGACY_XML_FLAG:
-        toolInfo = ET.Element('toolInfo')
-        toolInfo.appendChildTagWithText("toolName", SCRIPT_NAME)
-        toolInfo.appendChildTagWithText("toolVersion", __version__)
-        # Write toolInfo to stdout
-        writeElement(toolInfo, out)
-
-    # Process the input files
-    for path in EXISTING_FILES:
-
-        # Analyse file
-        xmlElement = checkOneFile(path, config.VALIDATION_FORMAT)
+    try:
+        out.write(xmlHead)
 
-        # Write output to stdout
-        writeElement(xmlElement, out)
+        # Create toolInfo element
 
-    # Close </results> element if wrapper flag is true
-    if wrap or recurse:
         if not config.LEGACY_XML_FLAG:
-            out.write("</jpylyzer>\n")
+            toolInfo = ET.Element('toolInfo')
+            toolInfo.appendChildTagWithText("toolName", SCRIPT_NAME)
+            toolInfo.appendChildTagWithText("toolVersion", __version__)
+            # Write toolInfo to stdout
+            writeElement(toolInfo, out)
+
+        # Process the input files, and write output to stdout
+        if config.JOBS > 1:
+            # Analyse files in worker processes. Results are returned in input order
+            settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+            with ProcessPoolExecutor(max_workers=config.JOBS) as executor:
+                writeSerialized(checkFilesInWorkers(executor, existingFiles, settings), out)
         else:
-            out.write("</results>\n")
+            writeElements((checkOneFile(path, config.VALIDATION_FORMAT)
+                           for path in existingFiles), out)
+
+        # Close </results> element if wrapper flag is true
+        out.write(xmlTail)
+    finally:
+        # Flush output, also if analysis stops with an error
+        closeOutput(out)
 
 
 def parseCommandLine():
@@ -729,6 +858,13 @@ def parseCommandLine():
                         dest="fmt",
                         default="jp2",
                         help="validation format; allowed values: jp2, j2c (default: jp2)")
+    PARSER.add_argument('--jobs', '-j',
+                        action="store",
+                        type=int,
+                        dest="jobs",
+                        default=1,
+                        help="number of files to analyse in parallel; 0 uses all \
+                        available CPUs, at most 61 on Windows (default: 1)")
     PARSER.add_argument('--legacyout', '-l',
                         action="store_true",
                         dest="legacyXMLFlag",
@@ -757,6 +893,12 @@ def parseCommandLine():
                         default=False,
                         help="when analysing a directory, recurse into subdirectories \
                                 (implies --wrapper)")
+    PARSER.add_argument('--validonly',
+                        action="store_true",
+                        dest="validOnlyFlag",
+                        default=False,
+                        help="only report validity of input image(s), without tests and \
+                                properties (implies no --mix output)")
     PARSER.add_argument('--verbose',
                         action="store_true",
                         dest="outputVerboseFlag",
@@ -807,11 +949,21 @@ def main():
     config.VALIDATION_FORMAT = args.fmt.lower()
     config.LEGACY_XML_FLAG = args.legacyXMLFlag
     config.MIX_FLAG = args.mixFlag
+    config.JOBS = args.jobs
+    config.VALID_ONLY_FLAG = args.validOnlyFlag
 
     # Exit if validation format is unknown
     if config.VALIDATION_FORMAT not in ['jp2', 'j2c']:
         msg = "'" + config.VALIDATION_FORMAT + "'  is not a supported value for --format"
         shared.errorExit(msg)
+    # Use all CPUs if number of jobs is 0 (up to the maximum number of worker
+    # processes); exit if it is negative or above that maximum
+    maxJobs = MAX_JOBS_WINDOWS if config.PLATFORM == "win32" else sys.maxsize
+    if config.JOBS == 0:
+        config.JOBS = min(os.cpu_count() or 1, maxJobs)
+    if config.JOBS < 0 or config.JOBS > maxJobs:
+        msg = "'" + str(config.JOBS) + "' is not a supported value for --jobs"
+        shared.errorExit(msg)
     # Exit if validation format is 'j2c' and legacyXML flag is set
     if config.LEGACY_XML_FLAG and config.VALIDATION_FORMAT == 'j2c':
         msg = " j2c format is supported if --legacyout is set"
@@ -819,11 +971,14 @@ def main():
     # Ignore entered value of inputWrapperFlag, unless legacyXML flag id set
     if not config.LEGACY_XML_FLAG:
         config.INPUT_WRAPPER_FLAG = True
-    # Reset value of mixFlag to 0 if legacyXMLFlag is set or format is 'j2c'
+    # Reset value of mixFlag to 0 if legacyXMLFlag or validOnlyFlag is set
+    # or format is 'j2c'
     if config.LEGACY_XML_FLAG:
         config.MIX_FLAG = 0
     if config.VALIDATION_FORMAT == 'j2c':
         config.MIX_FLAG = 0
+    if config.VALID_ONLY_FLAG:
+        config.MIX_FLAG = 0
 
     # Check files
     checkFiles(config.INPUT_RECURSIVE_FLAG, config.INPUT_WRAPPER_FLAG, jp2In)
@@ -14,293 +14,370 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import collections
 import re
+import xml.etree.ElementTree as ETree
 from . import etpatch as ET
 
+# Codec name and version in codestream comment, e.g. 'Kakadu-v6.4'
+_RE_CODEC_VERSION = re.compile(r'(.*)-v([0-9\.]*)')
+# Software name and version in XMP CreatorTool, e.g. 'Adobe Photoshop CS3 10.0'
+_RE_CREATOR_TOOL = re.compile(r'^(.*) ([0-9\.]*)$')
+
+# Name spaces used in XMP metadata
+_NS_RDF = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}'
+_NS_XMP = '{http://ns.adobe.com/xap/1.0/}'
+_NS_TIFF = '{http://ns.adobe.com/tiff/1.0/}'
+_NS_EXIF_AUX = '{http://ns.adobe.com/exif/1.0/aux/}'
+
+# Paths (relative to properties element) of all values used for MIX. These
+# are the same for every file, so they are built once here.
+_PATH_BRAND = 'fileTypeBox/br'
+_PATH_COMPRESSION_RATIO = 'compressionRatio'
+_PATH_IMAGE_HEADER_BOX = 'jp2HeaderBox/imageHeaderBox'
+_PATH_COLOUR_SPECIFICATION_BOX = 'jp2HeaderBox/colourSpecificationBox'
+_PATH_CAPTURE_RESOLUTION_BOX = 'jp2HeaderBox/resolutionBox/captureResolutionBox'
+_PATH_DISPLAY_RESOLUTION_BOX = 'jp2HeaderBox/resolutionBox/displayResolutionBox'
+_PATH_SIZ = 'contiguousCodestreamBox/siz'
+_PATH_COD = 'contiguousCodestreamBox/cod'
+_PATH_TRANSFORMATION = 'contiguousCodestreamBox/cod/transformation'
+_PATH_COMMENT = 'contiguousCodestreamBox/com/comment'
+_PATH_XML_BOX_RDF = 'xmlBox/{adobe:ns:meta/}xmpmeta/' + _NS_RDF + 'RDF'
+_PATH_UUID_BOX_RDF = 'uuidBox/{adobe:ns:meta/}xmpmeta/' + _NS_RDF + 'RDF'
+_PATH_RDF_DESCRIPTION = _NS_RDF + 'Description'
+
+# Resolution boxes in order of preference, with their horizontal and vertical
+# resolution elements
+_RESOLUTION_BOXES = ((_PATH_CAPTURE_RESOLUTION_BOX,
+                      'hRescInPixelsPerMeter', 'vRescInPixelsPerMeter'),
+                     (_PATH_DISPLAY_RESOLUTION_BOX,
+                      'hResdInPixelsPerMeter', 'vResdInPixelsPerMeter'))
+
+# Elements that must be present in properties to generate MIX
+_REQUIRED_PATHS = (_PATH_COMPRESSION_RATIO,
+                   _PATH_IMAGE_HEADER_BOX,
+                   _PATH_COLOUR_SPECIFICATION_BOX,
+                   _PATH_SIZ,
+                   _PATH_COD)
+
+
+def _emit(tb, tag, text):
+    """Emit element with tag and text (if not None) to TreeBuilder tb."""
+    tb.start(tag, {})
+    if text is not None:
+        tb.data(text)
+    tb.end(tag)
+
+
+# Everything that differs between MIX versions (keys: mixFlag values)
+_MixVersion = collections.namedtuple('_MixVersion', [
+    'nsString',                 # Name space
+    'locSchemaString',          # Schema location
+    'byteOrder',                # Value of byteOrder
+    'samplingFrequencyUnit',    # Value of samplingFrequencyUnit (always in S.I.)
+    'rationalCompressionRatio', # compressionRatio is a Rational (else int)
+    'tilesElement',             # Tiles is an element (else a 'WxH' string)
+    'bitsPerSampleTag',         # Tag of bitsPerSample element
+    'joinBitsPerSampleValues'   # Join bitsPerSampleValue values in one element
+])
+
+_MIX_VERSIONS = {
+    1: _MixVersion(
+        nsString='http://www.loc.gov/mix/v10',
+        locSchemaString=('http://www.loc.gov/mix/v10 '
+                         'http://www.loc.gov/standards/mix/mix10/mix10.xsd'),
+        byteOrder='big_endian',
+        samplingFrequencyUnit='3',
+        rationalCompressionRatio=False,
+        tilesElement=False,
+        bitsPerSampleTag='mix:bitsPerSample',
+        joinBitsPerSampleValues=True),
+    2: _MixVersion(
+        nsString='http://www.loc.gov/mix/v20',
+        locSchemaString=('http://www.loc.gov/mix/v20 '
+                         'http://www.loc.gov/standards/mix/mix.xsd'),
+        byteOrder='big endian',
+        samplingFrequencyUnit='cm',
+        rationalCompressionRatio=True,
+        tilesElement=True,
+        bitsPerSampleTag='mix:BitsPerSample',
+        joinBitsPerSampleValues=False)
+}
+
+
 class Mix:
-    """Class for generating NISO MIX image metadata."""
+    """Class for generating NISO MIX image metadata.
+
+    All MIX elements are built in one pass through an ElementTree TreeBuilder,
+    which is cheaper than creating and appending each element separately.
+    The differences between MIX versions are looked up once, in __init__.
+    """
 
     def __init__(self, mixFlag):
-        """Initialise the Mix instance with a mixFlag."""
-        self.mixFlag = mixFlag
+        """Initialise the Mix instance with a mixFlag (1: MIX 1.0, 2: MIX 2.0)."""
+        self.version = _MIX_VERSIONS[mixFlag]
 
     def generateMixBasicDigitalObjectInformation(self, properties):
         """Generate a mix BasicDigitalObjectInformation."""
-        mixBdoi = ET.Element('mix:BasicDigitalObjectInformation')
-
-        mixFormatDesignation = ET.Element('mix:FormatDesignation')
-        br = properties.find('fileTypeBox/br')
+        br = properties.find(_PATH_BRAND)
         if br is None:
             formatName = 'image/jp2'
         else:
             value = br.text
             formatName = 'image/' + value.strip()
-        mixFormatDesignation.appendChildTagWithText('mix:formatName', formatName)
-        mixBdoi.append(mixFormatDesignation)
-        if self.mixFlag == 1:
-            mixBdoi.appendChildTagWithText('mix:byteOrder', 'big_endian')
-        else:
-            mixBdoi.appendChildTagWithText('mix:byteOrder', 'big endian')
-
-        mixComp = ET.Element('mix:Compression')
-        compression = properties.find('contiguousCodestreamBox/cod/transformation').text
+        compression = properties.find(_PATH_TRANSFORMATION).text
         if compression == '5-3 reversible':
             compressionScheme = 'JPEG 2000 Lossless'
         else:
             compressionScheme = 'JPEG 2000 Lossy'
-        mixComp.appendChildTagWithText('mix:compressionScheme', compressionScheme)
-        if self.mixFlag == 1:
-            # compressionRatio is a int in mix 1...
-            compressionRatio = int(round(float(properties.find('compressionRatio').text), 0))
-            mixComp.appendChildTagWithText('mix:compressionRatio', str(compressionRatio))
-        else:
+
+        tb = ETree.TreeBuilder()
+        tb.start('mix:BasicDigitalObjectInformation', {})
+        tb.start('mix:FormatDesignation', {})
+        _emit(tb, 'mix:formatName', formatName)
+        tb.end('mix:FormatDesignation')
+        _emit(tb, 'mix:byteOrder', self.version.byteOrder)
+
+        tb.start('mix:Compression', {})
+        _emit(tb, 'mix:compressionScheme', compressionScheme)
+        compressionRatio = float(properties.find(_PATH_COMPRESSION_RATIO).text)
+        if self.version.rationalCompressionRatio:
             # compressionRatio is a Rational in mix 2.0 (keep only 2 digits)
-            value = int(round(float(properties.find('compressionRatio').text) * 100, 0))
-            mixCompRatio = ET.Element('mix:compressionRatio')
-            mixCompRatio.appendChildTagWithText('mix:numerator', str(value))
-            mixCompRatio.appendChildTagWithText('mix:denominator', '100')
-            mixComp.append(mixCompRatio)
-        mixBdoi.append(mixComp)
+            tb.start('mix:compressionRatio', {})
+            _emit(tb, 'mix:numerator', str(round(compressionRatio * 100)))
+            _emit(tb, 'mix:denominator', '100')
+            tb.end('mix:compressionRatio')
+        else:
+            # compressionRatio is a int in mix 1...
+            _emit(tb, 'mix:compressionRatio', str(round(compressionRatio)))
+        tb.end('mix:Compression')
+        tb.end('mix:BasicDigitalObjectInformation')
 
-        return mixBdoi
+        return tb.close()
 
     def generateMixBasicImageInformation(self, properties):
         """Generate a mix BasicImageInformation."""
-        mixBio = ET.Element('mix:BasicImageInformation')
-        mixBic = ET.Element('mix:BasicImageCharacteristics')
-        width = str(properties.find('jp2HeaderBox/imageHeaderBox/width').text)
-        height = str(properties.find('jp2HeaderBox/imageHeaderBox/height').text)
-        mixBic.appendChildTagWithText('mix:imageWidth', width)
-        mixBic.appendChildTagWithText('mix:imageHeight', height)
+        tb = ETree.TreeBuilder()
+        tb.start('mix:BasicImageInformation', {})
+        tb.start('mix:BasicImageCharacteristics', {})
+        imageHeaderBox = properties.find(_PATH_IMAGE_HEADER_BOX)
+        width = str(imageHeaderBox.find('width').text)
+        height = str(imageHeaderBox.find('height').text)
+        _emit(tb, 'mix:imageWidth', width)
+        _emit(tb, 'mix:imageHeight', height)
+        tb.start('mix:PhotometricInterpretation', {})
         # Try ICC first
-        iccElement = properties.find('jp2HeaderBox/colourSpecificationBox/icc')
-        if iccElement:
-            mixPI = ET.Element('mix:PhotometricInterpretation')
-            colorSpace = properties.find('jp2HeaderBox/colourSpecificationBox/icc/colourSpace').text
-            mixPI.appendChildTagWithText('mix:colorSpace', colorSpace.strip())
-            iccProfile = properties.find('jp2HeaderBox/colourSpecificationBox/icc/description').text
-            mixColorProfile = ET.Element('mix:ColorProfile')
-            mixIccProfile = ET.Element('mix:IccProfile')
-            mixIccProfile.appendChildTagWithText('mix:iccProfileName', iccProfile)
-            mixColorProfile.append(mixIccProfile)
-            mixPI.append(mixColorProfile)
-            mixBic.append(mixPI)
+        colourSpecificationBox = properties.find(_PATH_COLOUR_SPECIFICATION_BOX)
+        iccElement = colourSpecificationBox.find('icc')
+        if iccElement is not None:
+            colorSpace = iccElement.find('colourSpace').text
+            _emit(tb, 'mix:colorSpace', colorSpace.strip())
+            iccProfile = iccElement.find('description').text
+            tb.start('mix:ColorProfile', {})
+            tb.start('mix:IccProfile', {})
+            _emit(tb, 'mix:iccProfileName', iccProfile)
+            tb.end('mix:IccProfile')
+            tb.end('mix:ColorProfile')
         else:
-            mixPI = ET.Element('mix:PhotometricInterpretation')
-            colorSpace = properties.find('jp2HeaderBox/colourSpecificationBox/enumCS').text
-            mixPI.appendChildTagWithText('mix:colorSpace', colorSpace.strip())
-            mixBic.append(mixPI)
-        mixBio.append(mixBic)
-
-        mixSFC = ET.Element('mix:SpecialFormatCharacteristics')
-        mixJP2 = ET.Element('mix:JPEG2000')
-        comment = properties.find('contiguousCodestreamBox/com/comment')
+            colorSpace = colourSpecificationBox.find('enumCS').text
+            _emit(tb, 'mix:colorSpace', colorSpace.strip())
+        tb.end('mix:PhotometricInterpretation')
+        tb.end('mix:BasicImageCharacteristics')
+
+        tb.start('mix:SpecialFormatCharacteristics', {})
+        tb.start('mix:JPEG2000', {})
+        comment = properties.find(_PATH_COMMENT)
         if comment is not None:
             commentText = comment.text
-            m = re.search(r'(.*)-v([0-9\.]*)', commentText)
+            m = _RE_CODEC_VERSION.search(commentText)
             if m:
                 # generate CodecCompliance only if it matches the regex
-                mixCodecCompliance = ET.Element('mix:CodecCompliance')
-                mixCodecCompliance.appendChildTagWithText('mix:codec', m.group(1))
-                mixCodecCompliance.appendChildTagWithText('mix:codecVersion', m.group(2))
-                mixJP2.append(mixCodecCompliance)
-        mixEncodingOptions = ET.Element('mix:EncodingOptions')
-        tilesX = properties.find('contiguousCodestreamBox/siz/xTsiz').text
-        tilesY = properties.find('contiguousCodestreamBox/siz/yTsiz').text
-        if self.mixFlag == 1:
-            tilesString = str(tilesX) + 'x' + str(tilesY)
-            mixEncodingOptions.appendChildTagWithText('mix:tiles', tilesString)
+                tb.start('mix:CodecCompliance', {})
+                _emit(tb, 'mix:codec', m.group(1))
+                _emit(tb, 'mix:codecVersion', m.group(2))
+                tb.end('mix:CodecCompliance')
+        tb.start('mix:EncodingOptions', {})
+        siz = properties.find(_PATH_SIZ)
+        cod = properties.find(_PATH_COD)
+        tilesX = siz.find('xTsiz').text
+        tilesY = siz.find('yTsiz').text
+        if self.version.tilesElement:
+            tb.start('mix:Tiles', {})
+            _emit(tb, 'mix:tileWidth', str(tilesX))
+            _emit(tb, 'mix:tileHeight', str(tilesY))
+            tb.end('mix:Tiles')
         else:
-            mixTiles = ET.Element('mix:Tiles')
-            mixTiles.appendChildTagWithText('mix:tileWidth', str(tilesX))
-            mixTiles.appendChildTagWithText('mix:tileHeight', str(tilesY))
-            mixEncodingOptions.append(mixTiles)
+            tilesString = str(tilesX) + 'x' + str(tilesY)
+            _emit(tb, 'mix:tiles', tilesString)
 
-        layers = properties.find('contiguousCodestreamBox/cod/layers').text
+        layers = cod.find('layers').text
         if str(layers) != "0":
-            mixEncodingOptions.appendChildTagWithText('mix:qualityLayers', str(layers))
-        levels = properties.find('contiguousCodestreamBox/cod/levels').text
+            _emit(tb, 'mix:qualityLayers', str(layers))
+        levels = cod.find('levels').text
         if str(levels) != "0":
-            mixEncodingOptions.appendChildTagWithText('mix:resolutionLevels', str(levels))
+            _emit(tb, 'mix:resolutionLevels', str(levels))
 
-        mixJP2.append(mixEncodingOptions)
-        mixSFC.append(mixJP2)
-        mixBio.append(mixSFC)
-        return mixBio
+        tb.end('mix:EncodingOptions')
+        tb.end('mix:JPEG2000')
+        tb.end('mix:SpecialFormatCharacteristics')
+        tb.end('mix:BasicImageInformation')
+        return tb.close()
 
     @staticmethod
-    def findValueInRDF(prop, prefixPath, ns, tag):
-        """Find a value in RDF : first as an element then as an attribute."""
-        path = prefixPath + "/" + ns + tag
-        value = prop.find(path)
-        if value is not None:
-            return value.text
-
-        value = prop.find(prefixPath).attrib.get(ns + tag, None)
-        if value and value is not None:
-            return value
-        return None
+    def findValueInRDF(descriptions, attribs, key):
+        """Find a value in RDF : first as an element then as an attribute.
 
-    @staticmethod
-    def addIfExist(prop, prefixPath, ns, tag, destEl, destTagName):
-        """Look for a value in RDF and build a element, if found."""
-        value = Mix.findValueInRDF(prop, prefixPath, ns, tag)
-        if value is not None:
-            destEl.appendChildTagWithText(destTagName, value.strip())
-            return True
-        return False
+        Elements are searched in all Description elements, attributes in the
+        attribute dictionary (attribs) of the first one.
+        """
+        for description in descriptions:
+            value = description.find(key)
+            if value is not None:
+                return value.text
+        return attribs.get(key) or None
 
     def generateMixImageCaptureMetadata(self, properties):
         """Generate a mix ImageCaptureMetadata."""
-        if self.mixFlag == 0:
-            # Avoid a static method using self
+        # An RDF element without children counts as missing
+        rdfBox = properties.find(_PATH_XML_BOX_RDF)
+        if rdfBox is None or len(rdfBox) == 0:
+            rdfBox = properties.find(_PATH_UUID_BOX_RDF)
+        if rdfBox is None or len(rdfBox) == 0:
             return None
 
-        mixIcm = ET.Element('mix:ImageCaptureMetadata')
-        rdfBox = properties.find('xmlBox/{adobe:ns:meta/}xmpmeta/'
-                                 '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF')
-        if not rdfBox:
-            rdfBox = properties.find('uuidBox/{adobe:ns:meta/}xmpmeta/'
-                                     '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF')
-        if not rdfBox:
-            return None
-        mixGci = ET.Element('mix:GeneralCaptureInformation')
-        Mix.addIfExist(rdfBox,
-                       '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description',
-                       '{http://ns.adobe.com/xap/1.0/}', 'CreateDate',
-                       mixGci,
-                       'mix:dateTimeCreated')
-        Mix.addIfExist(rdfBox, '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description',
-                       '{http://ns.adobe.com/tiff/1.0/}',
-                       'Artist',
-                       mixGci,
-                       'mix:imageProducer')
-        mixIcm.append(mixGci)
-        fillSc = False
-        mixSc = ET.Element('mix:ScannerCapture')
-        fillSc = Mix.addIfExist(rdfBox,
-                                '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description',
-                                '{http://ns.adobe.com/tiff/1.0/}',
-                                'Make',
-                                mixSc,
-                                'mix:scannerManufacturer') or fillSc
-        fillSm = False
-        mixSm = ET.Element('mix:ScannerModel')
-        fillSm = Mix.addIfExist(rdfBox,
-                                '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description',
-                                '{http://ns.adobe.com/tiff/1.0/}',
-                                'Model',
-                                mixSm,
-                                'mix:scannerModelName')
-        fillSm = Mix.addIfExist(rdfBox,
-                                '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description',
-                                '{http://ns.adobe.com/exif/1.0/aux/}',
-                                'SerialNumber',
-                                mixSm,
-                                'mix:scannerModelSerialNo') or fillSm
-        if fillSm:
-            mixSc.append(mixSm)
-            fillSc = True
-
-        creatorTool = Mix.findValueInRDF(rdfBox,
-                                         '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description',
-                                         '{http://ns.adobe.com/xap/1.0/}',
-                                         'CreatorTool')
-        if creatorTool is not None:
-            mixSss = ET.Element('mix:ScanningSystemSoftware')
-            m = re.search(r'^(.*) ([0-9\.]*)$', creatorTool)
-            if m:
-                mixSss.appendChildTagWithText('mix:scanningSoftwareName', m.group(1))
-                mixSss.appendChildTagWithText('mix:scanningSoftwareVersionNo', m.group(2))
-            else:
-                mixSss.appendChildTagWithText('mix:scanningSoftwareName', creatorTool)
-            mixSc.append(mixSss)
-            fillSc = True
+        # Look up Description elements only once
+        descriptions = rdfBox.findall(_PATH_RDF_DESCRIPTION)
+        attribs = descriptions[0].attrib if descriptions else {}
 
-        if fillSc:
-            mixIcm.append(mixSc)
+        # Collect all values first, because they determine which (wrapper)
+        # elements are needed
+        createDate = Mix.findValueInRDF(descriptions, attribs,
+                                        _NS_XMP + 'CreateDate')
+        artist = Mix.findValueInRDF(descriptions, attribs,
+                                    _NS_TIFF + 'Artist')
+        make = Mix.findValueInRDF(descriptions, attribs,
+                                  _NS_TIFF + 'Make')
+        model = Mix.findValueInRDF(descriptions, attribs,
+                                   _NS_TIFF + 'Model')
+        serialNumber = Mix.findValueInRDF(descriptions, attribs,
+                                          _NS_EXIF_AUX + 'SerialNumber')
+        creatorTool = Mix.findValueInRDF(descriptions, attribs,
+                                         _NS_XMP + 'CreatorTool')
 
-        return mixIcm
+        tb = ETree.TreeBuilder()
+        tb.start('mix:ImageCaptureMetadata', {})
+        tb.start('mix:GeneralCaptureInformation', {})
+        if createDate is not None:
+            _emit(tb, 'mix:dateTimeCreated', createDate.strip())
+        if artist is not None:
+            _emit(tb, 'mix:imageProducer', artist.strip())
+        tb.end('mix:GeneralCaptureInformation')
+
+        fillSm = model is not None or serialNumber is not None
+        fillSc = make is not None or fillSm or creatorTool is not None
+        if fillSc:
+            tb.start('mix:ScannerCapture', {})
+            if make is not None:
+                _emit(tb, 'mix:scannerManufacturer', make.strip())
+            if fillSm:
+                tb.start('mix:ScannerModel', {})
+                if model is not None:
+                    _emit(tb, 'mix:scannerModelName', model.strip())
+                if serialNumber is not None:
+                    _emit(tb, 'mix:scannerModelSerialNo', serialNumber.strip())
+                tb.end('mix:ScannerModel')
+            if creatorTool is not None:
+                tb.start('mix:ScanningSystemSoftware', {})
+                m = _RE_CREATOR_TOOL.search(creatorTool)
+                if m:
+                    _emit(tb, 'mix:scanningSoftwareName', m.group(1))
+                    _emit(tb, 'mix:scanningSoftwareVersionNo', m.group(2))
+                else:
+                    _emit(tb, 'mix:scanningSoftwareName', creatorTool)
+                tb.end('mix:ScanningSystemSoftware')
+            tb.end('mix:ScannerCapture')
+        tb.end('mix:ImageCaptureMetadata')
 
+        return tb.close()
 
     def generateMixImageAssessmentMetadata(self, properties):
         """Generate a mix ImageAssessmentMetadata."""
-        mixIam = ET.Element('mix:ImageAssessmentMetadata')
+        tb = ETree.TreeBuilder()
+        tb.start('mix:ImageAssessmentMetadata', {})
 
-        # Get the resolution in the captureResolutionBox first
-        resolutionBox = properties.find('jp2HeaderBox/resolutionBox/captureResolutionBox')
-        if resolutionBox is not None:
-            numX = int(float(resolutionBox.find('hRescInPixelsPerMeter').text) * 100)
-            numY = int(float(resolutionBox.find('vRescInPixelsPerMeter').text) * 100)
-        else:
-            # Then try the displayResolutionBox
-            resolutionBox = properties.find('jp2HeaderBox/resolutionBox/displayResolutionBox')
+        # Get the resolution in the captureResolutionBox first, then try the
+        # displayResolutionBox
+        for boxPath, hTag, vTag in _RESOLUTION_BOXES:
+            resolutionBox = properties.find(boxPath)
             if resolutionBox is not None:
-                numX = int(float(resolutionBox.find('hResdInPixelsPerMeter').text) * 100)
-                numY = int(float(resolutionBox.find('vResdInPixelsPerMeter').text) * 100)
+                numX = int(float(resolutionBox.findtext(hTag)) * 100)
+                numY = int(float(resolutionBox.findtext(vTag)) * 100)
+                break
         if resolutionBox is not None:
-            mixSm = ET.Element('mix:SpatialMetrics')
-            if self.mixFlag == 1:
-                mixSm.appendChildTagWithText('mix:samplingFrequencyUnit', '3') # always in S.I.
-            else:
-                mixSm.appendChildTagWithText('mix:samplingFrequencyUnit', 'cm') # always in S.I.
-            mixXSamplingFrequency = ET.Element('mix:xSamplingFrequency')
-            mixXSamplingFrequency.appendChildTagWithText('mix:numerator', str(numX))
-            mixXSamplingFrequency.appendChildTagWithText('mix:denominator', '10000')
-            mixSm.append(mixXSamplingFrequency)
-            mixYSamplingFrequency = ET.Element('mix:ySamplingFrequency')
-            mixYSamplingFrequency.appendChildTagWithText('mix:numerator', str(numY))
-            mixYSamplingFrequency.appendChildTagWithText('mix:denominator', '10000')
-            mixSm.append(mixYSamplingFrequency)
-            mixIam.append(mixSm)
-
-        size = properties.find('contiguousCodestreamBox/siz')
+            tb.start('mix:SpatialMetrics', {})
+            _emit(tb, 'mix:samplingFrequencyUnit', self.version.samplingFrequencyUnit)
+            tb.start('mix:xSamplingFrequency', {})
+            _emit(tb, 'mix:numerator', str(numX))
+            _emit(tb, 'mix:denominator', '10000')
+            tb.end('mix:xSamplingFrequency')
+            tb.start('mix:ySamplingFrequency', {})
+            _emit(tb, 'mix:numerator', str(numY))
+            _emit(tb, 'mix:denominator', '10000')
+            tb.end('mix:ySamplingFrequency')
+            tb.end('mix:SpatialMetrics')
+
+        size = properties.find(_PATH_SIZ)
         values = size.findall('ssizDepth')
-        mixICE = ET.Element('mix:ImageColorEncoding')
-        if self.mixFlag == 1:
-            mixBPS = ET.Element('mix:bitsPerSample')
-            mixICE.append(mixBPS)
-            mixBPS.appendChildTagWithText('mix:bitsPerSampleValue',
-                                          ','.join(map(lambda e: e.text, values)))
-            mixBPS.appendChildTagWithText('mix:bitsPerSampleUnit', 'integer')
+        tb.start('mix:ImageColorEncoding', {})
+        tb.start(self.version.bitsPerSampleTag, {})
+        if self.version.joinBitsPerSampleValues:
+            _emit(tb, 'mix:bitsPerSampleValue', ','.join(e.text for e in values))
         else:
-            mixBPS = ET.Element('mix:BitsPerSample')
-            mixICE.append(mixBPS)
             for e in values:
-                mixBPS.appendChildTagWithText('mix:bitsPerSampleValue', e.text)
-            mixBPS.appendChildTagWithText('mix:bitsPerSampleUnit', 'integer')
+                _emit(tb, 'mix:bitsPerSampleValue', e.text)
+        _emit(tb, 'mix:bitsPerSampleUnit', 'integer')
+        tb.end(self.version.bitsPerSampleTag)
 
         num = size.find('csiz').text
-        mixICE.appendChildTagWithText('mix:samplesPerPixel', num)
-        mixIam.append(mixICE)
+        _emit(tb, 'mix:samplesPerPixel', num)
+        tb.end('mix:ImageColorEncoding')
+        tb.end('mix:ImageAssessmentMetadata')
 
-        return mixIam
+        return tb.close()
 
     def generateMix(self, properties):
-        """Generate a mix representation."""
+        """Generate a mix representation.
+
+        Returns None if properties lack any of the elements that MIX needs.
+        """
+        for path in _REQUIRED_PATHS:
+            if properties.find(path) is None:
+                return None
+
         xsiNsString = 'http://www.w3.org/2001/XMLSchema-instance'
-        if self.mixFlag == 1:
-            nsString = 'http://www.loc.gov/mix/v10'
-            locSchemaString = ('http://www.loc.gov/mix/v10 '
-                               'http://www.loc.gov/standards/mix/mix10/mix10.xsd')
-        else:
-            nsString = 'http://www.loc.gov/mix/v20'
-            locSchemaString = ('http://www.loc.gov/mix/v20 '
-                               'http://www.loc.gov/standards/mix/mix.xsd')
 
         mixRoot = ET.Element(
-            'mix:mix', {'xmlns:mix': nsString,
+            'mix:mix', {'xmlns:mix': self.version.nsString,
                         'xmlns:xsi': xsiNsString,
-                        'xsi:schemaLocation': locSchemaString})
+                        'xsi:schemaLocation': self.version.locSchemaString})
 
         mixBdoi = self.generateMixBasicDigitalObjectInformation(properties)
         mixRoot.append(mixBdoi)
         mixBio = self.generateMixBasicImageInformation(properties)
         mixRoot.append(mixBio)
         mixIcm = self.generateMixImageCaptureMetadata(properties)
-        if mixIcm and mixIcm is not None:
+        if mixIcm is not None:
             mixRoot.append(mixIcm)
         mixIam = self.generateMixImageAssessmentMetadata(properties)
         mixRoot.append(mixIam)
 
         return mixRoot
+
+
+# One (stateless) generator instance for each MIX version
+_MIX_GENERATORS = {mixFlag: Mix(mixFlag) for mixFlag in _MIX_VERSIONS}
+
+
+def getMix(mixFlag):
+    """Return MIX generator for mixFlag (1: MIX 1.0, 2: MIX 2.0)."""
+    return _MIX_GENERATORS[mixFlag]
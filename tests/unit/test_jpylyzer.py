@@ -1,10 +1,20 @@
 # pylint: disable=missing-docstring
+import io
+import mmap
+import os
+import subprocess
 import sys
+import xml.etree.ElementTree as ETree
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 
 from jpylyzer.jpylyzer import __version__, checkNullArgs, checkNoInput, \
-                              printHelpAndExit, EXISTING_FILES, getFiles
+                              printHelpAndExit, getFiles, findFiles, \
+                              stripSurrogatePairs
+import jpylyzer.byteconv as bc
 import jpylyzer.config as config
+import jpylyzer.etpatch as ET
+import jpylyzer.jpylyzer as jpy
 
 def test_version():
     assert __version__
@@ -47,9 +57,159 @@ def test_print_help():
     assert pytest_wrapped_excep.value.code is None
 
 def test_get_files():
-    assert not EXISTING_FILES
-    getFiles('./*')
-    assert EXISTING_FILES
-    if sys.version_info > (3, 0):
-        EXISTING_FILES.clear()
-        assert not EXISTING_FILES
+    assert getFiles('./*')
+    assert not getFiles('./*.doesnotexist')
+
+def test_strip_surrogate_pairs():
+    assert stripSurrogatePairs(u'balloon.jp2') == u'balloon.jp2'
+    assert stripSurrogatePairs(u'ball\udcc3oon.jp2') == u'ball?oon.jp2'
+    assert stripSurrogatePairs(u'n\udcff\udcfe.jp2') == u'n??.jp2'
+    assert stripSurrogatePairs(u'bälloon.jp2') == u'bälloon.jp2'
+
+def test_remove_control_characters():
+    # Tab, newline and return are kept; other C0, C1 and surrogates are removed
+    assert bc.removeControlCharacters(u'a\tb\nc\rd') == u'a\tb\nc\rd'
+    assert bc.removeControlCharacters(u'a\x00b\x1fc\x7fd') == u'abcd'
+    assert bc.removeControlCharacters(u'a\x80b\x9fc') == u'abc'
+    assert bc.removeControlCharacters(u'a\ud800b\udcffc') == u'abc'
+    # Letters outside Latin-1 (and the BMP) are kept
+    assert bc.removeControlCharacters(u'\u0416\u65e5\U0001d400') == u'\u0416\u65e5\U0001d400'
+    assert bc.removeControlCharacters(u'a\U000e0001b\U0010ffff') == u'ab'
+
+def test_control_character_table_bounded():
+    bc.removeControlCharacters(u''.join(chr(i) for i in range(0x10000, 0x10400)))
+    assert max(bc._CONTROL_CHARACTER_TABLE) <= 0xFFFF
+
+def test_find_files(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'a.jp2').write_bytes(b'')
+    (tmp_path / 'sub' / 'b.jp2').write_bytes(b'')
+    (tmp_path / 'sub' / 'c.txt').write_bytes(b'')
+    assert findFiles(False, [str(tmp_path / 'a.jp2')]) == [str(tmp_path / 'a.jp2')]
+    assert sorted(findFiles(True, [str(tmp_path)])) == \
+        sorted([str(tmp_path / 'a.jp2'), str(tmp_path / 'sub' / 'b.jp2'),
+                str(tmp_path / 'sub' / 'c.txt')])
+    assert sorted(findFiles(True, [str(tmp_path / '*.jp2')])) == \
+        sorted([str(tmp_path / 'a.jp2'), str(tmp_path / 'sub' / 'b.jp2')])
+    assert findFiles(False, [str(tmp_path / '?.jp2')]) == [str(tmp_path / 'a.jp2')]
+    assert findFiles(True, [str(tmp_path / '[b-z].jp2')]) == \
+        [str(tmp_path / 'sub' / 'b.jp2')]
+
+def test_find_files_wildcard_order(tmp_path):
+    # Files in all subdirectories of a directory come before deeper files
+    (tmp_path / 's1' / 'deep').mkdir(parents=True)
+    (tmp_path / 's2' / 'deep').mkdir(parents=True)
+    for name in ['a.jp2', 's1/b.jp2', 's1/deep/c.jp2', 's2/d.jp2', 's2/deep/e.jp2']:
+        (tmp_path / name).write_bytes(b'')
+    found = findFiles(True, [str(tmp_path / '*.jp2')])
+    assert found[0] == str(tmp_path / 'a.jp2')
+    assert sorted(found[1:3]) == [str(tmp_path / 's1' / 'b.jp2'), str(tmp_path / 's2' / 'd.jp2')]
+    assert sorted(found[3:]) == [str(tmp_path / 's1' / 'deep' / 'c.jp2'),
+                                 str(tmp_path / 's2' / 'deep' / 'e.jp2')]
+
+def test_find_files_symlinked_directory(tmp_path):
+    # As with os.walk, files in a linked directory are found, but the link is
+    # not walked further
+    (tmp_path / 'real' / 'sub').mkdir(parents=True)
+    (tmp_path / 'real' / 'b.jp2').write_bytes(b'')
+    (tmp_path / 'real' / 'sub' / 'c.jp2').write_bytes(b'')
+    (tmp_path / 'top').mkdir()
+    (tmp_path / 'top' / 'link').symlink_to(tmp_path / 'real')
+    assert findFiles(True, [str(tmp_path / 'top' / '*.jp2')]) == \
+        [str(tmp_path / 'top' / 'link' / 'b.jp2')]
+    assert findFiles(True, [str(tmp_path / 'top')]) == []
+
+def test_find_files_hidden_directories(tmp_path):
+    (tmp_path / '.hdir').mkdir()
+    (tmp_path / 'sub' / '.hid').mkdir(parents=True)
+    (tmp_path / '.hdir' / 'e.jp2').write_bytes(b'')
+    (tmp_path / 'sub' / '.hid' / 'c.jp2').write_bytes(b'')
+    (tmp_path / 'sub' / '.f.jp2').write_bytes(b'')
+    expected = sorted([str(tmp_path / '.hdir' / 'e.jp2'),
+                       str(tmp_path / 'sub' / '.hid' / 'c.jp2')])
+    # Hidden directories are searched, hidden files only match dot patterns
+    assert sorted(findFiles(True, [str(tmp_path / '*.jp2')])) == expected
+    assert sorted(findFiles(True, [str(tmp_path)])) == \
+        sorted(expected + [str(tmp_path / 'sub' / '.f.jp2')])
+    assert findFiles(True, [str(tmp_path / '.*.jp2')]) == \
+        [str(tmp_path / 'sub' / '.f.jp2')]
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run_cli(*args):
+    return subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'cli.py')] + list(args),
+                          cwd=ROOT_DIR, stdout=subprocess.PIPE, check=True).stdout
+
+@pytest.mark.parametrize('options', [[], ['--mix', '2'], ['--nopretty']])
+def test_jobs_output_identical(options):
+    files = sorted(os.path.join('example_files', name)
+                   for name in os.listdir(os.path.join(ROOT_DIR, 'example_files'))
+                   if name.endswith('.jp2'))
+    sequential = run_cli(*(options + files))
+    assert run_cli(*(['--jobs', '2'] + options + files)) == sequential
+
+@pytest.mark.parametrize('platform, jobs', [('linux', '-1'), ('win32', '62')])
+def test_unsupported_jobs(platform, jobs):
+    code = ('import sys; from jpylyzer import config, jpylyzer; config.PLATFORM = %r; '
+            'sys.argv = ["jpylyzer", "--jobs", %r, "example_files/balloon.jp2"]; '
+            'jpylyzer.main()' % (platform, jobs))
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    assert result.stdout == b''
+    assert b"'" + jobs.encode() + b"' is not a supported value for --jobs" in result.stderr
+
+def test_check_files_in_workers_takes_paths_lazily(monkeypatch):
+    monkeypatch.setattr(config, 'JOBS', 1)
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    taken = []
+
+    def paths():
+        for i in range(100):
+            taken.append(i)
+            yield os.path.join(ROOT_DIR, 'example_files', 'balloon.jp2')
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = jpy.checkFilesInWorkers(executor, paths(), settings)
+        assert b'<fileName>balloon.jp2</fileName>' in next(results)
+        assert len(taken) == jpy.JOBS_FILES_AHEAD
+        assert len(list(results)) == 99
+
+def test_write_serialized():
+    xmlOuts = [b'<file>%d</file>' % i for i in range(jpy.OUTPUT_BATCH_ELEMENTS * 2 + 1)]
+    out = io.BytesIO()
+    jpy.writeSerialized(iter(xmlOuts), out)
+    assert out.getvalue() == b''.join(xmlOuts)
+
+def test_memory_map_madvise_error(monkeypatch):
+    class FailingAdviceMap(mmap.mmap):
+        def madvise(self, *args):
+            raise OSError('madvise failed')
+
+    monkeypatch.setattr(jpy, 'MMAP_THRESHOLD', 0)
+    monkeypatch.setattr(jpy.mmap, 'mmap', FailingAdviceMap)
+    path = os.path.join(ROOT_DIR, 'example_files', 'balloon.jp2')
+    fileData = jpy.fileToMemoryMap(path)
+    with open(path, 'rb') as fobj:
+        assert fileData[:] == fobj.read()
+
+def test_valid_only(tmp_path):
+    with open(os.path.join(ROOT_DIR, 'example_files', 'balloon.jp2'), 'rb') as fobj:
+        (tmp_path / 'truncated.jp2').write_bytes(fobj.read(600000))
+    files = [os.path.join('example_files', 'balloon.jp2'), str(tmp_path / 'truncated.jp2')]
+    ns = {'j': 'http://openpreservation.org/ns/jpylyzer/v2/'}
+    full = ETree.fromstring(run_cli(*files)).findall('j:file', ns)
+    validOnly = ETree.fromstring(run_cli('--validonly', '--mix', '2', *files)).findall('j:file', ns)
+    assert [f.findtext('j:isValid', namespaces=ns) for f in validOnly] == \
+        [f.findtext('j:isValid', namespaces=ns) for f in full] == ['True', 'False']
+    for result in validOnly:
+        assert len(result.find('j:tests', ns)) == 0
+        assert len(result.find('j:properties', ns)) == 0
+        assert result.find('.//{http://www.loc.gov/mix/v20}mix') is None
+        assert result.find('j:propertiesExtension', ns) is None
+
+def test_check_one_file_after_chdir(monkeypatch):
+    monkeypatch.chdir(os.path.join(ROOT_DIR, 'example_files'))
+    result = jpy.checkOneFile('balloon.jp2', 'jp2')
+    assert result.findtext('fileInfo/filePath') == \
+        os.path.join(ROOT_DIR, 'example_files', 'balloon.jp2')
+
@@ -0,0 +1,111 @@
+# pylint: disable=missing-docstring
+import json
+import os
+import xml.etree.ElementTree as ETree
+import pytest
+
+import jpylyzer.etpatch as ET
+from jpylyzer import mix
+
+# Expected MIX output for all cases below (generated with jpylyzer 2.0)
+EXPECTED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'data', 'mix_expected.json')
+
+PROPERTIES = '''<properties>
+<fileTypeBox>{brand}</fileTypeBox>
+<jp2HeaderBox><imageHeaderBox><width>10</width><height>20</height></imageHeaderBox>
+<colourSpecificationBox>{colour}</colourSpecificationBox>
+<resolutionBox>{resolution}</resolutionBox></jp2HeaderBox>
+<contiguousCodestreamBox><siz><xTsiz>64</xTsiz><yTsiz>32</yTsiz><csiz>3</csiz>
+<ssizDepth>8</ssizDepth><ssizDepth>8</ssizDepth><ssizDepth>16</ssizDepth></siz>
+<cod><transformation>{transformation}</transformation><layers>6</layers><levels>5</levels></cod>
+{comment}</contiguousCodestreamBox>
+{ratio}{xmp}</properties>'''
+
+XMP = ('<{box}><x:xmpmeta xmlns:x="adobe:ns:meta/">'
+       '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" '
+       'xmlns:xmp="http://ns.adobe.com/xap/1.0/" xmlns:tiff="http://ns.adobe.com/tiff/1.0/" '
+       'xmlns:aux="http://ns.adobe.com/exif/1.0/aux/">{descriptions}</rdf:RDF>'
+       '</x:xmpmeta></{box}>')
+
+DEFAULTS = {
+    'brand': '<br>jp2 </br>',
+    'colour': '<icc><colourSpace>RGB </colourSpace><description>sRGB IEC61966-2.1</description></icc>',
+    'resolution': ('<captureResolutionBox><hRescInPixelsPerMeter>11811.02</hRescInPixelsPerMeter>'
+                   '<vRescInPixelsPerMeter>11811.0</vRescInPixelsPerMeter></captureResolutionBox>'),
+    'transformation': '5-3 reversible',
+    'comment': '<com><comment>Kakadu-v6.4.1</comment></com>',
+    'ratio': '<compressionRatio>4.5</compressionRatio>',
+    'xmp': '',
+}
+
+# Each case changes one or more values of DEFAULTS
+VARIATIONS = {
+    'defaults': {},
+    'noBrand': {'brand': ''},
+    'iccWithoutDescription': {
+        'colour': '<icc><colourSpace>RGB </colourSpace><description/></icc>'},
+    'enumeratedColourSpace': {'colour': '<enumCS>sRGB</enumCS>'},
+    'displayResolution': {
+        'resolution': ('<displayResolutionBox><hResdInPixelsPerMeter>2834.6</hResdInPixelsPerMeter>'
+                       '<vResdInPixelsPerMeter>2834.645</vResdInPixelsPerMeter></displayResolutionBox>')},
+    'noResolution': {'resolution': ''},
+    'irreversible': {'transformation': '9-7 irreversible'},
+    'otherComment': {'comment': '<com><comment>nothing</comment></com>'},
+    'noComment': {'comment': ''},
+    'ratioHalf': {'ratio': '<compressionRatio>2.5</compressionRatio>'},
+    'ratioThreeDigits': {'ratio': '<compressionRatio>12.345</compressionRatio>'},
+    'ratioRounding': {'ratio': '<compressionRatio>2.005</compressionRatio>'},
+    'xmpElements': {'xmp': XMP.format(box='xmlBox', descriptions=(
+        '<rdf:Description xmp:CreateDate=" 2008 " tiff:Make="Canon">'
+        '<tiff:Model> EOS </tiff:Model><aux:SerialNumber>123</aux:SerialNumber>'
+        '<xmp:CreatorTool>Adobe Photoshop CS3 10.0</xmp:CreatorTool>'
+        '<tiff:Artist>Me</tiff:Artist></rdf:Description>'))},
+    'xmpAttributes': {'xmp': XMP.format(box='uuidBox', descriptions=(
+        '<rdf:Description xmp:CreatorTool="Tool" tiff:Artist="Me" '
+        'aux:SerialNumber="9" tiff:Model=""/>'))},
+    'xmpSerialNumberOnly': {'xmp': XMP.format(box='uuidBox', descriptions=(
+        '<rdf:Description aux:SerialNumber="9"/>'))},
+    'xmpEmptyDescription': {'xmp': XMP.format(box='xmlBox', descriptions=(
+        '<rdf:Description/>'))},
+    'xmpNoDescription': {'xmp': XMP.format(box='xmlBox', descriptions='')},
+    'xmpEmptyXmlBox': {'xmp': XMP.format(box='xmlBox', descriptions='') + XMP.format(
+        box='uuidBox', descriptions='<rdf:Description tiff:Make="Canon"/>')},
+    'xmpSeveralDescriptions': {'xmp': XMP.format(box='xmlBox', descriptions=(
+        '<rdf:Description tiff:Make="Canon"/>'
+        '<rdf:Description xmp:CreatorTool="Ignored">'
+        '<tiff:Model>EOS</tiff:Model><xmp:CreateDate>2010</xmp:CreateDate></rdf:Description>'
+        '<rdf:Description><tiff:Model>Second</tiff:Model>'
+        '<aux:SerialNumber>7</aux:SerialNumber></rdf:Description>'))},
+}
+
+CASES = [(mixFlag, name) for mixFlag in (1, 2) for name in VARIATIONS]
+
+
+def make_properties(name):
+    values = dict(DEFAULTS, **VARIATIONS[name])
+    parser = ETree.XMLParser(target=ETree.TreeBuilder(element_factory=ET.Element))
+    return ETree.fromstring(PROPERTIES.format(**values), parser=parser)
+
+
+def generate(mixFlag, name):
+    result = mix.Mix(mixFlag).generateMix(make_properties(name))
+    return None if result is None else ETree.tostring(result, encoding='unicode')
+
+
+@pytest.fixture(scope='module')
+def expected():
+    with open(EXPECTED_FILE, encoding='utf-8') as fobj:
+        return json.load(fobj)
+
+
+@pytest.mark.parametrize('mixFlag, name', CASES)
+def test_generate_mix(expected, mixFlag, name):
+    assert generate(mixFlag, name) == expected[str(mixFlag)][name]
+
+
+@pytest.mark.parametrize('mixFlag', [1, 2])
+def test_get_mix(mixFlag):
+    properties = make_properties('xmpElements')
+    assert ETree.tostring(mix.getMix(mixFlag).generateMix(properties)) == \
+        ETree.tostring(mix.Mix(mixFlag).generateMix(properties))